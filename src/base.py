@@ -1,34 +1,75 @@
-from typing import Set, Dict, List, Tuple, Optional
+from typing import Set, Dict, List, Tuple, Optional, Sequence, Union
 from collections import deque
+from functools import cached_property
+from itertools import product
+import weakref
+
+# Labels with '#' are expanded into every head-code tuple they match, as long
+# as that stays below this many keys per transition. Wider labels go to the
+# per-state wildcard masks, so the table grows at most linearly in delta.
+MAX_WILDCARD_EXPANSION = 16
+
+# minimize() gives up on NFHs whose determinization has more states than this
+MAX_DFA_STATES = 4096
+
+# Attributes of an NFH derived only from its structure (everything but alpha)
+DERIVED_SLOTS = (
+    'transition_map', 'sym_idx', 'foreign_sym', 'num_syms', 'code_key', 'code_bits', 'encode_table',
+    'labels', 'label_id',
+    'delta_index', 'state_names', 'state_id', 'accepting_ids', 'trans_by_bytes', 'wildcard_masks',
+    'initial_mask', 'accepting_mask', 'eps_mask', 'eps_closure', 'trans_flat', 'pred_map',
+    'trans_closed', 'dfa_delta', 'min_dfa',
+)
+
+# Live NFHs by (k, states, alphabet, initial, accepting, delta), donors of
+# DERIVED_SLOTS for structurally equal NFHs built later
+_index_cache = weakref.WeakValueDictionary()
+
+def _ordered(items) -> list:
+    # Sorted for stable ids, by repr when the items are not mutually
+    # comparable (e.g. states named by both strings and ints)
+    try:
+        return sorted(items)
+    except TypeError:
+        return sorted(items, key=repr)
 
 class NFH:
+    __slots__ = ('states', 'alphabet', 'initial_states', 'accepting_states', 'delta', 'k', 'alpha',
+                 'alpha_mask', 'quotient', '__weakref__') + DERIVED_SLOTS
+
     def __init__(self, states: Set[str], 
                  initial_states: Set[str], accepting_states: Set[str],
                  k: int, delta: Set[Tuple[str, Tuple[str, ...], str]],
-                 alpha: List[str], alphabet: Set[str] = {'0', '1'}):
-        self.states = states
-        self.alphabet = alphabet
-        self.initial_states = initial_states
-        self.accepting_states = accepting_states
+                 alpha: List[str], alphabet: Set[str] = {'0', '1'}, _skip_validate: bool = False):
+        # The structure is fixed after construction, so the state and symbol
+        # sets are frozen. delta keeps the caller's container and repr.
+        self.states = frozenset(states)
+        self.alphabet = frozenset(alphabet)
+        self.initial_states = frozenset(initial_states)
+        self.accepting_states = frozenset(accepting_states)
         self.delta = delta
         self.k = k
         self.alpha = alpha if alpha else []
-        
-        # validate inputs (for both sync and async)
-        assert len(states) > 0, "Must have at least one state"
-        assert initial_states.issubset(states), "Initial states must be valid states"
-        assert len(initial_states) > 0, "Must have at least one initial state"
-        assert accepting_states.issubset(states), "Accepting states must be valid states"
-        assert len(accepting_states) > 0, "Must have at least one accepting state"
-        assert all(t[0] in states and t[2] in states for t in delta), "All states in transitions must be valid states"
-        assert all(all(symbol in alphabet or symbol == '#' for symbol in t[1]) for t in delta), "All symbols in transitions must be from the alphabet or be '#'"
-        assert all(len(t[1]) == k for t in delta), "All symbol vectors in transitions must have length k"
-        assert all(q in {'E', 'A'} for q in alpha), "All quantifiers must be 'E' or 'A'"
-        assert len(alpha) == k, "alpha must have k quantifiers"
 
-        self.transition_map = {state: [] for state in states}
-        for t in delta:
-            self.transition_map[t[0]].append(t)
+        # Equal structures share their derived tables, including the lazily
+        # filled DFA caches, so rebuilding the same automaton is cheap. A
+        # structure found there was validated when its donor was built.
+        key = (k, self.states, self.alphabet, self.initial_states, self.accepting_states, frozenset(delta))
+        shared = _index_cache.get(key)
+        if not _skip_validate:
+            self._validate(structure=shared is None)
+
+        # Bit i set means the (i+1)-th quantifier is existential
+        self.alpha_mask = sum(1 << i for i, q in enumerate(alpha) if q == 'E')
+        # Set by minimized(): (reduced NFH, representative of each state)
+        self.quotient: Optional[Tuple['NFH', Dict[str, str]]] = None
+
+        if shared is not None:
+            for name in DERIVED_SLOTS:
+                setattr(self, name, getattr(shared, name))
+        else:
+            self._build_index()
+            _index_cache[key] = self
 
         '''
         Example for an NFH structure:
@@ -46,6 +87,328 @@ class NFH:
             alpha = ['A', 'E']
         '''
 
+    def _validate(self, structure: bool = True):
+        # Raises AssertionError on malformed input. Trusted internal callers
+        # skip it with NFH(..., _skip_validate=True).
+        states, delta, k, alpha = self.states, self.delta, self.k, self.alpha
+        if structure:
+            if not states:
+                raise AssertionError("Must have at least one state")
+            if not self.initial_states <= states:
+                raise AssertionError("Initial states must be valid states")
+            if not self.initial_states:
+                raise AssertionError("Must have at least one initial state")
+            if not self.accepting_states <= states:
+                raise AssertionError("Accepting states must be valid states")
+            if not self.accepting_states:
+                raise AssertionError("Must have at least one accepting state")
+            if not all(t[0] in states and t[2] in states for t in delta):
+                raise AssertionError("All states in transitions must be valid states")
+            symbols = self.alphabet | {'#'}
+            if not all(symbols.issuperset(t[1]) for t in delta):
+                raise AssertionError("All symbols in transitions must be from the alphabet or be '#'")
+            if not all(len(t[1]) == k for t in delta):
+                raise AssertionError("All symbol vectors in transitions must have length k")
+        if not all(q in {'E', 'A'} for q in alpha):
+            raise AssertionError("All quantifiers must be 'E' or 'A'")
+        if len(alpha) != k:
+            raise AssertionError("alpha must have k quantifiers")
+
+    def _build_index(self):
+        states, initial_states, accepting_states = self.states, self.initial_states, self.accepting_states
+        delta, k, alphabet = self.delta, self.k, self.alphabet
+
+        self.transition_map = {state: [] for state in states}
+        for t in delta:
+            self.transition_map[t[0]].append(t)
+
+        # Symbol codes: 0 is '#' (padding / exhausted tape), alphabet symbols are
+        # numbered from 1 and foreign_sym marks tape characters outside the alphabet.
+        self.sym_idx = {'#': 0}
+        for symbol in _ordered(alphabet):
+            self.sym_idx.setdefault(symbol, len(self.sym_idx))
+        self.foreign_sym = len(self.sym_idx)
+        self.num_syms = self.foreign_sym + 1
+        # Tapes and head tuples are bytes while every code fits in a byte
+        # (alphabets of up to 254 symbols). Larger alphabets use tuples of
+        # ints instead, which are slower to hash but have no size limit.
+        # code_key turns a sequence of codes into a trans_by_bytes key, and
+        # code_bits is the width of a symbol code in the dfa_delta keys.
+        if self.foreign_sym < 256:
+            self.code_key = bytes
+            self.code_bits = 8
+            # Code of each Latin-1 character, for encoding words with bytes.translate
+            self.encode_table = bytes(self.sym_idx.get(chr(b), self.foreign_sym) for b in range(256))
+        else:
+            self.code_key = tuple
+            self.code_bits = self.foreign_sym.bit_length()
+            self.encode_table = None
+
+        # Distinct labels are interned to small ids: labels[i] is the tuple for
+        # label id i.
+        self.labels: List[Tuple[str, ...]] = []
+        self.label_id: Dict[Tuple[str, ...], int] = {}
+        for (_, symbols, _) in delta:
+            if symbols not in self.label_id:
+                self.label_id[symbols] = len(self.labels)
+                self.labels.append(symbols)
+
+        # Successor states grouped by (source, label id), and the transition
+        # triples of delta in the same groups
+        self.delta_index: Dict[Tuple[str, int], List[str]] = {}
+        transitions: Dict[Tuple[str, int], list] = {}
+        for t in delta:
+            key = (t[0], self.label_id[t[1]])
+            self.delta_index.setdefault(key, []).append(t[2])
+            transitions.setdefault(key, []).append(t)
+
+        # States are interned to ids 0..n-1 for the run internals, which compare
+        # and hash small ints. delta and the other public sets keep the names.
+        self.state_names = _ordered(states)
+        self.state_id = {state: i for i, state in enumerate(self.state_names)}
+        self.accepting_ids = frozenset(self.state_id[state] for state in accepting_states)
+
+        # Per-state lookup (indexed by state id) keyed by the head codes. A '#'
+        # in a label matches any head, so each label is stored under every
+        # concrete head tuple it matches and a lookup is one exact dict hit.
+        # Labels whose expansion would be too large are kept per state as
+        # (entries, masks): bit j of masks[i][code] is set iff the i-th symbol
+        # of entry j's label is that code or '#' ('#' alone matching an
+        # exhausted tape, code 0), so the entries matching a head tuple are
+        # the bits of the AND of one mask per tape. Entries are
+        # (advance vector, [(transition, successor id)]), where the advance
+        # vector is 1 on the tapes the label consumes and the transitions are
+        # the triples of delta itself, so a run history only holds references.
+        self.trans_by_bytes = [{} for _ in self.state_names]
+        self.wildcard_masks: List[Optional[Tuple[list, List[List[int]]]]] = [None] * len(self.state_names)
+        for (q, label), group in transitions.items():
+            codes = self.code_key(self.sym_idx[symbol] for symbol in self.labels[label])
+            entry = (tuple(int(c != 0) for c in codes), [(t, self.state_id[t[2]]) for t in group])
+            src = self.state_id[q]
+            if self.num_syms ** codes.count(0) <= MAX_WILDCARD_EXPANSION:
+                options = [range(self.num_syms) if c == 0 else (c,) for c in codes]
+                for concrete in product(*options):
+                    self.trans_by_bytes[src].setdefault(self.code_key(concrete), []).append(entry)
+            else:
+                if self.wildcard_masks[src] is None:
+                    self.wildcard_masks[src] = ([], [[0] * self.num_syms for _ in range(k)])
+                entries, masks = self.wildcard_masks[src]
+                bit = 1 << len(entries)
+                entries.append(entry)
+                for i, c in enumerate(codes):
+                    if c == 0:
+                        for code in range(self.num_syms):
+                            masks[i][code] |= bit
+                    else:
+                        masks[i][c] |= bit
+
+        # Bitset encoding: state i is bit i. eps_mask[i] holds the states reached
+        # from i by an all-'#' label (no tape moves), eps_closure[i] everything
+        # reachable that way. For the k = 1 subset simulation,
+        # trans_flat[i * num_syms + code] is the mask of states reached from i
+        # by consuming that symbol, and trans_closed the same followed by the
+        # '#' closure, so one subset step is a single lookup per frontier state.
+        self.initial_mask = 0
+        for state in initial_states:
+            self.initial_mask |= 1 << self.state_id[state]
+        self.accepting_mask = 0
+        for state in accepting_states:
+            self.accepting_mask |= 1 << self.state_id[state]
+        self.eps_mask = [0] * len(self.state_names)
+        for (q, symbols, next_q) in delta:
+            if all(symbol == '#' for symbol in symbols):
+                self.eps_mask[self.state_id[q]] |= 1 << self.state_id[next_q]
+        self.eps_closure = []
+        for i in range(len(self.state_names)):
+            closed = todo = 1 << i
+            while todo:
+                low = todo & -todo
+                todo ^= low
+                new = self.eps_mask[low.bit_length() - 1] & ~closed
+                closed |= new
+                todo |= new
+            self.eps_closure.append(closed)
+
+        self.trans_flat = [0] * (len(self.state_names) * self.num_syms)
+        self.pred_map = {state: [] for state in states}
+        if k == 1:
+            for t in delta:
+                code = self.sym_idx[t[1][0]]
+                if code != 0:
+                    self.trans_flat[self.state_id[t[0]] * self.num_syms + code] |= 1 << self.state_id[t[2]]
+                self.pred_map[t[2]].append(t)
+        self.trans_closed = [0] * len(self.trans_flat)
+        if k == 1:
+            for idx, mask in enumerate(self.trans_flat):
+                closed = 0
+                while mask:
+                    low = mask & -mask
+                    closed |= self.eps_closure[low.bit_length() - 1]
+                    mask ^= low
+                self.trans_closed[idx] = closed
+
+        # Subset-construction DFA for k = 1, filled lazily by dfa_step. Keys pack
+        # a '#'-closed state mask and a symbol code as (mask << code_bits) | code.
+        self.dfa_delta: Dict[int, int] = {}
+        # Set by minimize(): (block of each reachable state mask, flat block
+        # transition table indexed by block * num_syms + code, accepting blocks),
+        # or False if the DFA is too large to minimize
+        self.min_dfa: Union[None, bool, Tuple[Dict[int, int], List[int], int]] = None
+
+    def id_of(self, state: str) -> int:
+        return self.state_id[state]
+
+    def name_of(self, state_id: int) -> str:
+        return self.state_names[state_id]
+
+    def dfa_step(self, frontier: int, sym: int) -> int:
+        # DFA successor of a closed state mask on a symbol code (k = 1 only)
+        key = frontier << self.code_bits | sym
+        out = self.dfa_delta.get(key)
+        if out is None:
+            out = 0
+            while frontier:
+                low = frontier & -frontier
+                out |= self.trans_closed[(low.bit_length() - 1) * self.num_syms + sym]
+                frontier ^= low
+            self.dfa_delta[key] = out
+        return out
+
+    def determinize(self) -> Dict[int, int]:
+        # Completes dfa_delta over every subset reachable from an initial state
+        assert self.k == 1, "Only single-tape NFHs can be determinized"
+        todo = [self.eps_closure[i] for i in range(len(self.state_names)) if self.initial_mask >> i & 1]
+        seen = set(todo)
+        while todo:
+            frontier = todo.pop()
+            for sym in range(1, self.num_syms):
+                out = self.dfa_step(frontier, sym)
+                if out and out not in seen:
+                    seen.add(out)
+                    todo.append(out)
+        return self.dfa_delta
+
+    def minimize(self) -> Optional[Tuple[Dict[int, int], List[int], int]]:
+        # Hopcroft partition refinement of the DFA reachable from the initial
+        # states (including the dead state 0). Returns None, and keeps using
+        # the lazy DFA, if the determinization exceeds MAX_DFA_STATES; that
+        # outcome is cached too, so later calls do not walk the DFA again.
+        assert self.k == 1, "Only single-tape NFHs can be minimized"
+        if self.min_dfa is not None:
+            return self.min_dfa or None
+        masks = [0] + [self.eps_closure[i] for i in range(len(self.state_names)) if self.initial_mask >> i & 1]
+        index = {mask: i for i, mask in enumerate(masks)}
+        codes = range(self.num_syms)
+        succ = []
+        for mask in masks:
+            if len(masks) > MAX_DFA_STATES:
+                self.min_dfa = False
+                return None
+            row = []
+            for code in codes:
+                out = self.dfa_step(mask, code)
+                if out not in index:
+                    index[out] = len(masks)
+                    masks.append(out)
+                row.append(index[out])
+            succ.append(row)
+
+        # inverse[code][t] lists the DFA states moving to t on code
+        inverse = [[[] for _ in masks] for _ in range(self.num_syms)]
+        for s, row in enumerate(succ):
+            for code in codes:
+                inverse[code][row[code]].append(s)
+        accepting = frozenset(i for i, mask in enumerate(masks) if mask & self.accepting_mask)
+        blocks = [set(b) for b in (accepting, set(range(len(masks))) - accepting) if b]
+        block_of = [0] * len(masks)
+        for b, members in enumerate(blocks):
+            for s in members:
+                block_of[s] = b
+        work = set(range(len(blocks)))
+        while work:
+            splitter = list(blocks[work.pop()])
+            for code in codes:
+                touched: Dict[int, List[int]] = {}
+                for t in splitter:
+                    for s in inverse[code][t]:
+                        touched.setdefault(block_of[s], []).append(s)
+                for b, members in touched.items():
+                    if len(members) == len(blocks[b]):
+                        continue
+                    new = set(members)
+                    blocks[b] -= new
+                    blocks.append(new)
+                    for s in new:
+                        block_of[s] = len(blocks) - 1
+                    if b in work or len(new) <= len(blocks[b]):
+                        work.add(len(blocks) - 1)
+                    if b not in work and len(new) > len(blocks[b]):
+                        work.add(b)
+
+        table = [0] * (len(blocks) * self.num_syms)
+        accepting_blocks = 0
+        for s, row in enumerate(succ):
+            b = block_of[s]
+            for code in codes:
+                table[b * self.num_syms + code] = block_of[row[code]]
+            if s in accepting:
+                accepting_blocks |= 1 << b
+        self.min_dfa = ({mask: block_of[i] for i, mask in enumerate(masks)}, table, accepting_blocks)
+        return self.min_dfa
+
+    def minimized(self) -> 'NFH':
+        # Equivalent NFH with bisimilar states merged, for any k: each label
+        # is one symbol, and states are split until those in a block agree on
+        # acceptance and on the (label, successor block) pairs they have. Each
+        # block is named after its smallest state. Returns self if no two
+        # states merge.
+        if self.quotient is not None:
+            return self.quotient[0]
+        names = self.state_names
+        accepting_ids = self.accepting_ids
+        out = [[] for _ in names]
+        for (q, label), targets in self.delta_index.items():
+            src = self.state_id[q]
+            out[src].extend((label, self.state_id[t]) for t in targets)
+        block_of = [int(i in accepting_ids) for i in range(len(names))]
+        count = len(set(block_of))
+        while True:
+            signatures: Dict[tuple, int] = {}
+            refined = [signatures.setdefault((block_of[i], frozenset((label, block_of[t]) for label, t in out[i])),
+                                             len(signatures))
+                       for i in range(len(names))]
+            block_of = refined
+            if len(signatures) == count:
+                break
+            count = len(signatures)
+
+        if count == len(names):
+            self.quotient = (self, {state: state for state in self.states})
+            return self
+        rep_of_block: Dict[int, str] = {}
+        # Ids follow state_names, so the first state met in a block is its smallest
+        for i in range(len(names)):
+            rep_of_block.setdefault(block_of[i], names[i])
+        rep = {names[i]: rep_of_block[block_of[i]] for i in range(len(names))}
+        delta = {(rep[q], symbols, rep[t]) for (q, symbols, t) in self.delta}
+        reduced = NFH(set(rep_of_block.values()), {rep[q] for q in self.initial_states},
+                      {rep[q] for q in self.accepting_states}, self.k, delta, self.alpha, self.alphabet,
+                      _skip_validate=True)
+        self.quotient = (reduced, rep)
+        return reduced
+
+    def encode(self, word) -> Sequence[int]:
+        # Tape as symbol codes, one byte per character (a tuple of ints for
+        # alphabets too large for bytes)
+        if self.encode_table is not None and isinstance(word, str):
+            try:
+                return word.encode('latin-1').translate(self.encode_table)
+            except UnicodeEncodeError:
+                pass
+        sym_idx = self.sym_idx
+        foreign_sym = self.foreign_sym
+        return self.code_key([sym_idx.get(ch, foreign_sym) for ch in word])
+
 class Hyperword: # Finite set of words
     def __init__(self, words: Set[str]):
         self.words = words
@@ -62,4 +425,12 @@ class Hyperword: # Finite set of words
     def __str__(self):
         return "{ " + ", ".join(self.words) + " }"
 
+    # Deterministic iteration order for the quantifier loops, computed once
+    # per Hyperword instead of on every checkMembership call.
+    # Longest words first: they are the likeliest witnesses for 'E' and the
+    # likeliest counterexamples for 'A'.
+    @cached_property
+    def sorted_long_first(self) -> List[str]:
+        return sorted(self.words, key=lambda w: (-len(w), w))
+
 
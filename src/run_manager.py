@@ -1,17 +1,33 @@
-from typing import Dict, Optional, Tuple, Set
+from typing import Dict, List, Optional, Sequence, Tuple, Set
 from collections import deque
+from operator import add
+import math
 import time
 from .base import NFH
 
+# The clock is read once every this many search steps (must be a power of two)
+TIMEOUT_CHECK_INTERVAL = 1024
+
 class RunManager:
-    def __init__(self, nfh: NFH, assignment, initial_state: Optional[str] = None, timeout: float = 60, enable_timeout: bool = True):
+    __slots__ = (
+        'nfh', 'timeout', 'enable_timeout', 'initial_state', 'assignment', 'initial_assignment',
+        'tapes', 'run_history', 'current_state', 'ptrs', 'seen', '_head_codes', '_deadline',
+    )
+
+    def __init__(self, nfh: NFH, assignment, initial_state: Optional[str] = None, timeout: float = 60, enable_timeout: bool = True,
+                 tapes: Optional[Tuple[Sequence[int], ...]] = None, minimize: bool = False):
+        if initial_state is None:
+            initial_state = list(nfh.initial_states)[0]
+        if minimize:
+            # Search the merged automaton from the block of the initial state;
+            # the run history then holds its transitions
+            reduced = nfh.minimized()
+            initial_state = nfh.quotient[1].get(initial_state, initial_state)
+            nfh = reduced
         self.nfh = nfh
         self.timeout = timeout
         self.enable_timeout = enable_timeout
-        
-        if initial_state is None:
-            initial_state = list(nfh.initial_states)[0]
-        
+
         assert initial_state in self.nfh.states, "Initial state must be a valid state"
         assert len(assignment) == self.nfh.k, "Assignment must have k = {} words".format(self.nfh.k)
 
@@ -21,128 +37,231 @@ class RunManager:
         if isinstance(assignment, list):
             self.assignment = tuple(assignment)
         elif isinstance(assignment, dict):
-            # Sort by keys to ensure order 1..k
+            # Sort by keys to ensure order 1..k. Values may be strings, kept
+            # as they are, or sequences of characters (e.g. deques), joined.
             sorted_keys = sorted(assignment.keys(), key=lambda x: int(x))
-            self.assignment = tuple(deque(assignment[k]) if isinstance(assignment[k], str) else "".join(assignment[k]) for k in sorted_keys)
+            values = (assignment[k] for k in sorted_keys)
+            self.assignment = tuple(v if isinstance(v, str) else "".join(v) for v in values)
         else:
             raise ValueError("Assignment must be a list of strings")
 
         self.initial_assignment = list(self.assignment)
+        # Tapes encoded once as symbol codes for the searches (callers running
+        # many assignments over the same words may pass them pre-encoded)
+        if tapes is None:
+            tapes = tuple(nfh.encode(word) for word in self.assignment)
+        self.tapes = tapes
         
         # Run state
         self.run_history = [] 
         self.current_state = initial_state
         
-        # Pointers for current position in each string (0-indexed)
+        # Pointers for current position in each string (0-indexed), moved to
+        # the ends of the tapes by an accepting run
         self.ptrs = tuple([0] * self.nfh.k)
         
-        # Memoization: (state, ptrs) -> bool
-        self.memo: Dict[Tuple[str, Tuple[int, ...]], bool] = {}
-        
-        # Path reconstruction: (state, ptrs) -> transition that led to success
-        self.path_map: Dict[Tuple[str, Tuple[int, ...]], tuple] = {}
+        # Configurations (state id, ptrs) already reached by the search. A
+        # configuration's outcome does not depend on how it was reached, so
+        # each one is explored at most once.
+        self.seen: Set[Tuple[int, Tuple[int, ...]]] = set()
 
-    def _get_char(self, tape_idx, ptr):
-        if ptr < len(self.assignment[tape_idx]):
-            return self.assignment[tape_idx][ptr]
-        return '#'
+        # Scratch buffer holding the symbol code under each tape head
+        self._head_codes = bytearray(self.nfh.k) if self.nfh.code_key is bytes else [0] * self.nfh.k
 
-    def _solve(self, state: str, ptrs: Tuple[int, ...]) -> bool:
-        if self.enable_timeout and (time.time() - self.start_time > self.timeout):
-            return False
+    @property
+    def variables(self) -> Dict[str, deque]:
+        # Unread rest of each tape, keyed '1'..'k'
+        return {str(i + 1): deque(word[ptr:]) for i, (word, ptr) in enumerate(zip(self.assignment, self.ptrs))}
+
+    @staticmethod
+    def _wildcard_matches(wildcard: Tuple[list, List[List[int]]], heads: Sequence[int]) -> List[tuple]:
+        # Entries of a state's wildcard labels matching the heads: AND the
+        # per-tape masks, then take the set bits in declaration order
+        entries, masks = wildcard
+        matched = (1 << len(entries)) - 1
+        for mask, code in zip(masks, heads):
+            matched &= mask[code]
+            if not matched:
+                return []
+        result = []
+        while matched:
+            low = matched & -matched
+            result.append(entries[low.bit_length() - 1])
+            matched ^= low
+        return result
+
+    def _solve(self) -> bool:
+        # Iterative DFS over configurations (state id, ptrs). A stack frame is
+        # [configuration, pending successors, move taken] and a move is
+        # (transition, next state id, next ptrs), so once an accepting
+        # configuration is reached the frames spell out the run.
+        # Successors are expanded inline, with the tables bound to locals,
+        # since that runs once per configuration and dominates the search.
+        nfh = self.nfh
+        seen = self.seen
+        accepting_ids = nfh.accepting_ids
+        accepting_mask = nfh.accepting_mask
+        eps_closure = nfh.eps_closure
+        trans_by_bytes = nfh.trans_by_bytes
+        code_key = nfh.code_key
+        wildcard_masks = nfh.wildcard_masks
+        tapes = self.tapes
+        heads = self._head_codes
+        lengths = tuple(len(tape) for tape in tapes)
+        tape_range = range(nfh.k)
+
+        check_mask = TIMEOUT_CHECK_INTERVAL - 1
+        steps = 0
+
+        stack = []
+        key = (nfh.id_of(self.initial_state), (0,) * nfh.k)
+        while True:
+            (state, ptrs) = key
+            seen.add(key)
+            successors = []
+            if ptrs == lengths:
+                # Accepted if in accepting state AND all tapes consumed
+                if state in accepting_ids:
+                    self.run_history = [frame[2][0] for frame in stack]
+                    return True
+                # Only all-'#' moves remain; follow them only if they can accept
+                expand = eps_closure[state] & accepting_mask
+            else:
+                expand = True
+            if expand:
+                for i in tape_range:
+                    ptr = ptrs[i]
+                    heads[i] = tapes[i][ptr] if ptr < lengths[i] else 0
+                possible_transitions = trans_by_bytes[state].get(code_key(heads), ())
+                if wildcard_masks[state] is not None:
+                    possible_transitions = list(possible_transitions) + self._wildcard_matches(wildcard_masks[state], heads)
+                # Pushed in reverse so that popping from the end keeps the declared order
+                for advance, moves in reversed(possible_transitions):
+                    next_ptrs = tuple(map(add, ptrs, advance))
+                    for transition, next_state in reversed(moves):
+                        successors.append((transition, next_state, next_ptrs))
+            stack.append([key, successors, None])
 
-        state_key = (state, ptrs)
-        if state_key in self.memo:
-            return self.memo[state_key]
-            
-        if state_key in self.visiting:
-             return False
-
-        self.visiting.add(state_key)
-
-        # Check Acceptance (Base Case)
-        # Accepted if in accepting state AND all tapes consumed
-        if state in self.nfh.accepting_states:
-            all_consumed = True
-            for i, ptr in enumerate(ptrs):
-                if ptr < len(self.assignment[i]):
-                    all_consumed = False
+            # Next unseen successor, backtracking out of exhausted configurations
+            while True:
+                if not stack:
+                    return False
+                frame = stack[-1]
+                if not frame[1]:
+                    stack.pop()
+                    continue
+                move = frame[1].pop()
+                key = (move[1], move[2])
+                if key not in seen:
+                    frame[2] = move
                     break
-            if all_consumed:
-                self.memo[state_key] = True
-                self.visiting.remove(state_key)
-                return True
-
-        # Recursion
-        possible_transitions = self.nfh.transition_map.get(state, [])
-        for transition in possible_transitions:
-            (_, symbols, next_state) = transition
-            
-            valid = True
-            next_ptrs_list = list(ptrs)
-            
-            for i, sym in enumerate(symbols):
-                # i corresponds to tape i (0-indexed)
-                curr_char = self._get_char(i, ptrs[i])
-                
-                if sym == '#':
-                    pass
+
+            steps += 1
+            if not steps & check_mask and time.perf_counter() > self._deadline:
+                return False
+
+    def _run_subset(self) -> bool:
+        # k = 1: '#' labels are epsilon moves and every other label consumes one
+        # symbol, so the run is a subset simulation with one bitmask per position.
+        # The steps go through the NFH's lazily built DFA, shared by all runs.
+        nfh = self.nfh
+        frontier = nfh.eps_closure[nfh.state_id[self.initial_state]]
+        check_mask = TIMEOUT_CHECK_INTERVAL - 1
+        if nfh.min_dfa and not self._min_dfa_accepts(frontier):
+            return False
+        layers = [frontier]
+        for pos, sym in enumerate(self.tapes[0]):
+            if not pos & check_mask and time.perf_counter() > self._deadline:
+                return False
+            frontier = nfh.dfa_step(frontier, sym)
+            if not frontier:
+                # Deadlock, no state can read the rest of the tape
+                return False
+            layers.append(frontier)
+
+        accepted = frontier & nfh.accepting_mask
+        if time.perf_counter() > self._deadline:
+            return False
+        if not accepted:
+            return False
+        self._reconstruct_subset(layers, nfh.state_names[(accepted & -accepted).bit_length() - 1])
+        return True
+
+    def _min_dfa_accepts(self, frontier: int) -> bool:
+        # Membership on the minimized DFA, a flat table lookup per symbol. It
+        # keeps no layers, so accepted words still go through the subset pass.
+        # The DFA only covers masks reachable from the initial states, so a
+        # run started elsewhere is left to the subset pass as well.
+        blocks, table, accepting_blocks = self.nfh.min_dfa
+        num_syms = self.nfh.num_syms
+        block = blocks.get(frontier)
+        if block is None:
+            return True
+        check_mask = TIMEOUT_CHECK_INTERVAL - 1
+        for pos, sym in enumerate(self.tapes[0]):
+            if not pos & check_mask and time.perf_counter() > self._deadline:
+                return False
+            block = table[block * num_syms + sym]
+        return bool(accepting_blocks >> block & 1)
+
+    def _reconstruct_subset(self, layers: List[int], final_state: str):
+        # Walks back from the accepting state one position at a time. Within a
+        # position, a backwards BFS over '#' moves finds a state that was entered
+        # by consuming the previous symbol (or the initial state at position 0).
+        nfh = self.nfh
+        tape = self.assignment[0]
+        reversed_history = []
+        target = final_state
+        for i in range(len(tape), -1, -1):
+            layer = layers[i]
+            symbol = (tape[i - 1],) if i > 0 else None
+            via = {target: None}
+            queue = deque([target])
+            entry = None
+            while queue:
+                state = queue.popleft()
+                if i == 0:
+                    if state == self.initial_state:
+                        entry = state
+                        break
                 else:
-                    if sym == curr_char:
-                        next_ptrs_list[i] += 1
-                    else:
-                        valid = False
+                    prev_layer = layers[i - 1]
+                    consumed = next((t for t in nfh.pred_map[state]
+                                     if t[1] == symbol and prev_layer >> nfh.state_id[t[0]] & 1), None)
+                    if consumed is not None:
+                        entry = consumed
                         break
-            
-            if valid:
-                next_ptrs = tuple(next_ptrs_list)
-                if self._solve(next_state, next_ptrs):
-                    self.memo[state_key] = True
-                    self.path_map[state_key] = transition
-                    self.visiting.remove(state_key)
-                    return True
+                for t in nfh.pred_map[state]:
+                    if t[1] == ('#',) and t[0] not in via and layer >> nfh.state_id[t[0]] & 1:
+                        via[t[0]] = t
+                        queue.append(t[0])
 
-        self.memo[state_key] = False
-        self.visiting.remove(state_key)
-        return False
+            # '#' moves from the entry state forward to the target
+            chain = []
+            while via[state] is not None:
+                chain.append(via[state])
+                state = via[state][2]
+            reversed_history.extend(reversed(chain))
 
-    def reconstruct_path(self):
-        curr_state = self.initial_state
-        curr_ptrs = tuple([0] * self.nfh.k)
-        
-        self.run_history = []
-        
-        while True:
-            key = (curr_state, curr_ptrs)
-            if key in self.path_map:
-                trans = self.path_map[key]
-                self.run_history.append(trans)
-                
-                # Update state and ptrs
-                (_, symbols, next_state) = trans
-                curr_state = next_state
-                
-                next_ptrs_list = list(curr_ptrs)
-                for i, sym in enumerate(symbols):
-                    if sym != '#':
-                        next_ptrs_list[i] += 1
-                curr_ptrs = tuple(next_ptrs_list)
-            else:
-                break
-                
-        self.variables = {}
-        for i, w in enumerate(self.assignment):
-            self.variables[str(i+1)] = deque() # All consumed
+            if i > 0:
+                reversed_history.append(entry)
+                target = entry[0]
+
+        self.run_history = reversed_history[::-1]
 
     def run(self) -> bool:
-        self.start_time = time.time()
-        self.memo = {}
-        self.visiting = set()
-        self.path_map = {}
+        # perf_counter is monotonic, so wall-clock jumps do not move the deadline
+        self._deadline = time.perf_counter() + self.timeout if self.enable_timeout else math.inf
+        self.seen = set()
+        if self.enable_timeout and self.timeout <= 0:
+            return False
 
-        success = self._solve(self.initial_state, self.ptrs)
+        if self.nfh.k == 1:
+            success = self._run_subset()
+        else:
+            success = self._solve()
         if success:
-            self.reconstruct_path()
+            self.ptrs = tuple(len(tape) for tape in self.tapes) # All consumed
             if self.run_history:
                 self.current_state = self.run_history[-1][2]
         return success
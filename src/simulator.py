@@ -1,9 +1,22 @@
-from typing import List, Dict, Optional, Tuple
+from typing import Iterable, List, Dict, Optional, Sequence, Tuple
+from itertools import product
+from multiprocessing import Pool
 from src.base import NFH, Hyperword
 from src.run_manager import RunManager
 
+# With max_workers > 1, hyperwords larger than this split the outermost
+# quantifier across processes
+PARALLEL_THRESHOLD = 512
 
-def checkMembership(A: NFH, S: Hyperword) -> Tuple[bool, List[RunManager]]:
+# Single-tape hyperwords with at least this many words are checked against
+# A's minimized DFA first. Minimizing walks the whole determinization once
+# (up to MAX_DFA_STATES x num_syms steps, without a deadline), and accepted
+# words then run twice, on the minimized DFA and in the subset pass that
+# records their run. Only many rejected words pay that back.
+MINIMIZE_THRESHOLD = 256
+
+
+def checkMembership(A: NFH, S: Hyperword, max_workers: Optional[int] = None) -> Tuple[bool, List[RunManager]]:
     # Singleton Hyperword: assignment = (w, ..., w)
     if len(S) == 1: 
         w = next(iter(S))
@@ -13,44 +26,93 @@ def checkMembership(A: NFH, S: Hyperword) -> Tuple[bool, List[RunManager]]:
             return True, [manager]
         return False, []
     
-    quantifiers = list(zip(A.alpha, range(1, A.k + 1)))
+    if A.k == 1 and len(S) >= MINIMIZE_THRESHOLD:
+        A.minimize()
+
+    quantifiers = list(range(1, A.k + 1))
+    # Processes are only used when asked for, so by default the result does
+    # not depend on the host
+    if max_workers is not None and max_workers > 1 and quantifiers and len(S) > PARALLEL_THRESHOLD:
+        return check_models_parallel(A, S, quantifiers, max_workers)
     return check_models(A, S, quantifiers, {})
 
 
-def check_models(A: NFH, S: Hyperword, quantifiers: List[tuple], assignment: Dict[int, str]) -> Tuple[bool, List[RunManager]]:
+def check_models_parallel(A: NFH, S: Hyperword, quantifiers: List[int], max_workers: int) -> Tuple[bool, List[RunManager]]:
+    # Needs at least one quantifier. Chunks are consumed in word order, so
+    # the outcome and managers match check_models; the managers come back
+    # pickled from the workers, so their nfh is a copy of A rather than A
+    # itself. Leaving the pool terminates the workers, including those still
+    # running chunks after an early exit.
+    exists = A.alpha_mask >> (quantifiers[0] - 1) & 1
+    words = S.sorted_long_first
+    # Several chunks per worker, so a decisive chunk ends the search early
+    size = -(-len(words) // (max_workers * 4))
+    chunks = [words[i:i + size] for i in range(0, len(words), size)]
+
+    # A and S are sent to each worker once, not with every chunk
+    with Pool(max_workers, initializer=_worker_init, initargs=(A, S, quantifiers)) as pool:
+        return _quantify(exists, pool.imap(_worker_check, chunks))
+
+
+# (A, S, quantifiers, encoded words) of the check a worker process runs
+_worker_task: Optional[Tuple[NFH, Hyperword, List[int], Dict[str, Sequence[int]]]] = None
+
+
+def _worker_init(A: NFH, S: Hyperword, quantifiers: List[int]):
+    global _worker_task
+    _worker_task = (A, S, quantifiers, {word: A.encode(word) for word in S})
+
+
+def _worker_check(words: List[str]) -> Tuple[bool, List[RunManager]]:
+    # Runs the outermost quantifier over one chunk of words in a worker process
+    A, S, quantifiers, encoded = _worker_task
+    var_idx = quantifiers[0]
+    exists = A.alpha_mask >> (var_idx - 1) & 1
+    return _quantify(exists, (check_models(A, S, quantifiers[1:], {var_idx: word}, encoded) for word in words))
+
+
+def _quantify(exists: int, outcomes: Iterable[Tuple[bool, List[RunManager]]]) -> Tuple[bool, List[RunManager]]:
+    # Combines the (success, managers) outcomes of a quantifier's choices,
+    # drawn lazily so it stops at the first witness ('E') or counterexample ('A')
+    all_managers = []
+    for success, managers in outcomes:
+        if exists and success:
+            return True, managers
+        if not exists and not success:
+            return False, []
+        all_managers.extend(managers)
+
+    if exists:
+        return False, []
+    return True, all_managers
+
+
+def check_models(A: NFH, S: Hyperword, quantifiers: List[int], assignment: Dict[int, str],
+                 encoded: Optional[Dict[str, Sequence[int]]] = None) -> Tuple[bool, List[RunManager]]:
+    # Each word is encoded once and shared by every assignment it appears in
+    if encoded is None:
+        encoded = {word: A.encode(word) for word in S}
+
     if not quantifiers:
         final_assignment = [assignment[i] for i in range(1, A.k + 1)]
-        manager = RunManager(A, final_assignment)
+        manager = RunManager(A, final_assignment, tapes=tuple(encoded[word] for word in final_assignment))
         if manager.run():
             return True, [manager]
         return False, []
 
-    (q_type, var_idx) = quantifiers[0]
-    remaining_quantifiers = quantifiers[1:]
-    
-    if q_type == 'E': # Exists
-        if len(S) == 0:
-            return False, []
-            
-        for word in S:
-            new_assignment = assignment.copy()
-            new_assignment[var_idx] = word
-            # Debug/Progress Info for searches
-            success, managers = check_models(A, S, remaining_quantifiers, new_assignment)
-            if success:
-                return True, managers
-        return False, []
-        
-    elif q_type == 'A': # For All
-        if len(S) == 0:
-            return True, []
-            
-        all_managers = []
-        for word in S:
+    # A block of equal quantifiers (e.g. E x1 E x2) is a single lazy loop over
+    # the product of their words, in the same order as nested loops would take
+    exists = A.alpha_mask >> (quantifiers[0] - 1) & 1
+    block = 1
+    while block < len(quantifiers) and (A.alpha_mask >> (quantifiers[block] - 1) & 1) == exists:
+        block += 1
+    block_vars = quantifiers[:block]
+    remaining_quantifiers = quantifiers[block:]
+
+    def outcomes():
+        for words in product(S.sorted_long_first, repeat=block):
             new_assignment = assignment.copy()
-            new_assignment[var_idx] = word
-            success, managers = check_models(A, S, remaining_quantifiers, new_assignment)
-            if not success:
-                return False, []
-            all_managers.extend(managers)
-        return True, all_managers
+            new_assignment.update(zip(block_vars, words))
+            yield check_models(A, S, remaining_quantifiers, new_assignment, encoded)
+
+    return _quantify(exists, outcomes())
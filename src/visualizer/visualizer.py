@@ -1,25 +1,110 @@
 
 """
 Visualizer for hyperautomata runs using matplotlib (Word View + Graph View).
+
+matplotlib and numpy are imported by the drawing functions themselves, so
+importing this module (as main.py always does) stays cheap when nothing is
+visualized.
 """
 
-import matplotlib.pyplot as plt
-from matplotlib.widgets import Button, TextBox
+from collections import OrderedDict, defaultdict
 import networkx as nx
 from typing import List, Tuple, Optional
 from src.base import NFH
 
+# Entries kept by each module-level cache, least recently used dropped first
+CACHE_SIZE = 32
+
+# Node positions by (nodes, edges, spring constant, seed), so showing the same
+# automaton again skips the Fruchterman-Reingold iterations
+_LAYOUT_CACHE = OrderedDict()
+
+# Graphs (with their edge labels) by NFH structure, built once per automaton
+_GRAPH_CACHE = OrderedDict()
+
+# Above this many edges, edges are drawn as one line collection and one
+# arrowhead collection instead of a FancyArrowPatch each
+MAX_PATCH_EDGES = 200
+
+
+def _cached(cache: OrderedDict, key, build):
+    """cache[key], built on a miss; keeps the CACHE_SIZE most recently used."""
+    value = cache.get(key)
+    if value is None:
+        value = cache[key] = build()
+        if len(cache) > CACHE_SIZE:
+            cache.popitem(last=False)
+    else:
+        cache.move_to_end(key)
+    return value
+
+
+def _spring_layout(G: nx.DiGraph, k: float, seed: int, iterations: int = 50) -> dict:
+    """Seeded spring layout of G, cached by its structure."""
+    def layout():
+        try:
+            # From 500 nodes networkx switches to its sparse solver (L-BFGS on
+            # the same energy since 3.5), which needs scipy
+            return nx.spring_layout(G, k=k, iterations=iterations, seed=seed)
+        except ImportError:
+            return nx.circular_layout(G)
+
+    key = (frozenset(G.nodes()), frozenset(G.edges()), k, seed, iterations)
+    return _cached(_LAYOUT_CACHE, key, layout)
+
+
+def _draw_edges(G: nx.DiGraph, pos: dict, ax, edgelist: List[Tuple], edge_color: str, width: float, **kwargs):
+    """Draws edgelist as networkx arrow patches, or batched for large graphs:
+    straight edges in a LineCollection with arrowheads three quarters along
+    them in a PolyCollection (self-loops keep their patches)."""
+    from matplotlib.collections import LineCollection, PolyCollection
+    import numpy as np
+
+    if len(edgelist) <= MAX_PATCH_EDGES:
+        nx.draw_networkx_edges(G, pos, ax=ax, edgelist=edgelist, edge_color=edge_color, width=width, **kwargs)
+        return
+    loops = [(u, v) for u, v in edgelist if u == v]
+    if loops:
+        nx.draw_networkx_edges(G, pos, ax=ax, edgelist=loops, edge_color=edge_color, width=width, **kwargs)
+    # Positions as an (N, 2) array, gathered by node index into the segments
+    node_index = {node: i for i, node in enumerate(pos)}
+    coords = np.array(list(pos.values()), dtype=float).reshape(-1, 2)
+    ends = np.array([(node_index[u], node_index[v]) for u, v in edgelist if u != v], dtype=np.intp).reshape(-1, 2)
+    segments = coords[ends]
+    ax.add_collection(LineCollection(segments, colors=edge_color, linewidths=width, zorder=1))
+
+    start = segments[:, 0]
+    direction = segments[:, 1] - start
+    unit = direction / np.maximum(np.hypot(direction[:, 0], direction[:, 1]), 1e-12)[:, None]
+    normal = np.stack([-unit[:, 1], unit[:, 0]], axis=1)
+    size = 0.015 * (np.ptp(coords, axis=0).max() or 1.0)
+    tip = start + 0.75 * direction
+    back = tip - unit * size
+    heads = np.stack([tip, back + normal * (size / 2), back - normal * (size / 2)], axis=1)
+    ax.add_collection(PolyCollection(heads, facecolors=edge_color, edgecolors=edge_color, zorder=1))
+
+
+def _graph_and_layout(automaton: NFH) -> Tuple[nx.DiGraph, dict]:
+    """Graph of the NFH and its node positions, shared by all views so one
+    layout serves the overview and the run of the same automaton."""
+    key = (automaton.states, automaton.initial_states, automaton.accepting_states, frozenset(automaton.delta))
+    G = _cached(_GRAPH_CACHE, key, lambda: build_automaton_graph(automaton))
+    return G, _spring_layout(G, k=0.9, seed=42)
+
 
 def visualize_automaton(automaton: NFH, title: str = "NFH"):
     """
     Visualize structure only (static).
     """
-    G = build_automaton_graph(automaton)
-    pos = nx.spring_layout(G, k=0.5, iterations=50)
+    import matplotlib.pyplot as plt
+
+    G, pos = _graph_and_layout(automaton)
     
-    plt.figure(figsize=(10, 8))
-    nx.draw(G, pos, with_labels=True, node_color='lightblue', 
-            node_size=2000, font_weight='bold', arrows=True)
+    ax = plt.figure(figsize=(10, 8)).add_axes((0, 0, 1, 1))
+    nx.draw_networkx_nodes(G, pos, ax=ax, node_color='lightblue', node_size=2000)
+    _draw_edges(G, pos, ax, list(G.edges()), edge_color='k', width=1.0, node_size=2000, arrows=True)
+    nx.draw_networkx_labels(G, pos, ax=ax, font_weight='bold')
+    ax.set_axis_off()
     plt.title(f"Automaton: {title}")
     plt.show()
 
@@ -40,22 +125,24 @@ def build_automaton_graph(automaton: NFH) -> nx.DiGraph:
     # We aggregate edges to avoid clutter? Or just multigraph? 
     # For simplicitly, DiGraph with labeling.
     
-    edge_labels = {}
-    
+    # Labels of each edge, collected first and joined once
+    edge_syms = defaultdict(list)
     for q, syms, next_q in automaton.delta:
         # syms is a tuple ('a', 'b') etc.
-        # Check if edge exists
-        if G.has_edge(q, next_q):
-            # Append label
-            current_label = edge_labels.get((q, next_q), "")
-            new_label = f"{syms}"
-            # Avoid too long labels?
-            if len(current_label) < 20: 
-                 edge_labels[(q, next_q)] = current_label + "\n" + new_label
-        else:
-            G.add_edge(q, next_q)
-            edge_labels[(q, next_q)] = f"{syms}"
-            
+        edge_syms[(q, next_q)].append(f"{syms}")
+    G.add_edges_from(edge_syms)
+
+    edge_labels = {}
+    for edge, labels in edge_syms.items():
+        # Avoid too long labels: stop once the text reaches 20 characters
+        kept, length = [], -1
+        for label in labels:
+            if length >= 20:
+                break
+            kept.append(label)
+            length += len(label) + 1
+        edge_labels[edge] = "\n".join(kept)
+
     # Store labels in graph for access later? or return them?
     # Easier to just attach to edge data if possible, but nx drawing needs distinct dict for labels.
     G.graph['edge_labels'] = edge_labels
@@ -71,6 +158,8 @@ def visualize_run(automaton: NFH, run_history: List[Tuple],
 
 
 def _visualize_run_interactive(automaton: NFH, run_history: List[Tuple], initial_assignment: List[str] = None):
+    import matplotlib.pyplot as plt
+    from matplotlib.widgets import Button, TextBox
     
     if not run_history:
         print("No run history to visualize.")
@@ -103,9 +192,7 @@ def _visualize_run_interactive(automaton: NFH, run_history: List[Tuple], initial
         cursor_history.append(list(current_cursors))
 
     # --- Graph Prep ---
-    G = build_automaton_graph(automaton)
-    # Use spring layout but fix it
-    pos = nx.spring_layout(G, seed=42, k=0.9) 
+    G, pos = _graph_and_layout(automaton)
     base_edge_labels = G.graph.get('edge_labels', {})
 
     # --- Figure ---
@@ -139,11 +226,21 @@ def _visualize_run_interactive(automaton: NFH, run_history: List[Tuple], initial
     
     # --- Helpers ---
     
-    def render_text_fixed_grid(ax, x, y, text_str, highlight_idx):
-        fs = 16 # Slightly smaller to fit bounds
-        char_interval = 0.022 
-        MAX_VISIBLE = 35 
-        
+    FONT_SIZE = 16 # Slightly smaller to fit bounds
+    CHAR_INTERVAL = 0.022
+    MAX_VISIBLE = 35
+
+    def make_text_fixed_grid(ax, x, y):
+        # Text artists for one word, placed once: a slot per visible
+        # character and the two ellipses. Steps only change their contents.
+        style = dict(fontsize=FONT_SIZE, fontfamily='monospace', transform=ax.transAxes)
+        return {
+            'chars': [ax.text(x + (i * CHAR_INTERVAL), y, '', ha='left', **style) for i in range(MAX_VISIBLE)],
+            'left': ax.text(x - 0.03, y, "<", color='gray', **style),
+            'right': ax.text(x + (MAX_VISIBLE * CHAR_INTERVAL), y, ">", color='gray', **style),
+        }
+
+    def render_text_fixed_grid(row, text_str, highlight_idx):
         if len(text_str) <= MAX_VISIBLE:
             visible_str = text_str
             start_offset = 0
@@ -162,36 +259,95 @@ def _visualize_run_interactive(automaton: NFH, run_history: List[Tuple], initial
             show_left_ell = (win_start > 0)
             show_right_ell = (win_end < len(text_str))
 
-        if show_left_ell:
-             ax.text(x - 0.03, y, "<", color='gray', fontsize=fs, fontfamily='monospace', transform=ax.transAxes)
-
-        for i, ch in enumerate(visible_str):
+        row['left'].set_visible(show_left_ell)
+        row['right'].set_visible(show_right_ell)
+        for i, slot in enumerate(row['chars']):
+            if i >= len(visible_str):
+                slot.set_text('')
+                continue
             true_idx = start_offset + i
-            color = 'red' if true_idx == highlight_idx else 'black'
-            weight = 'bold' if true_idx == highlight_idx else 'normal'
-            x_pos = x + (i * char_interval)
-            ax.text(x_pos, y, ch, color=color, fontsize=fs, fontfamily='monospace', fontweight=weight, transform=ax.transAxes, ha='left')
-                    
-        if show_right_ell:
-             x_end = x + (len(visible_str) * char_interval)
-             ax.text(x_end, y, ">", color='gray', fontsize=fs, fontfamily='monospace', transform=ax.transAxes)
+            slot.set_text(visible_str[i])
+            slot.set_color('red' if true_idx == highlight_idx else 'black')
+            slot.set_fontweight('bold' if true_idx == highlight_idx else 'normal')
 
     def format_sym_vector(syms):
         if len(syms) == 1:
             return f"({syms[0]})"
         return str(syms)
 
+    # --- Static Graph ---
+    # Drawn once in base colors and kept in the blit background. A step only
+    # draws an overlay: the highlighted edge in red, its label, and the nodes
+    # it joins, the current one in orange.
+    node_list = list(G.nodes())
+    base_node_colors = [G.nodes[node].get('color', 'lightblue') for node in node_list]
+    edges_list = list(G.edges())
+    # Index in edges_list of the edge taken into each step (None at the start)
+    edge_index = {edge: i for i, edge in enumerate(edges_list)}
+    step_edges = [None] + [edge_index.get((q_prev, q_next)) for q_prev, _, q_next in transitions_data]
+    base_color = dict(zip(node_list, base_node_colors))
+    nx.draw_networkx_nodes(G, pos, ax=ax_graph, nodelist=node_list, node_color=base_node_colors, node_size=1500)
+    node_texts = nx.draw_networkx_labels(G, pos, ax=ax_graph, font_weight='bold')
+    _draw_edges(G, pos, ax_graph, edges_list, edge_color='gray', width=1, arrowsize=20)
+    edge_texts = nx.draw_networkx_edge_labels(G, pos, ax=ax_graph, edge_labels=base_edge_labels, font_size=8)
+    for text in edge_texts.values():
+        # Above the edges, including the red copies added later
+        text.set_zorder(1.5)
+    ax_graph.set_title("Automaton State", fontsize=14, loc='left')
+
+    overlay_nodes = nx.draw_networkx_nodes(G, pos, ax=ax_graph, nodelist=node_list[:1], node_size=1500)
+    red_patches = {}
+    overlay_artists = []
+
+    def red_patch(idx):
+        # Red copy of an edge, made the first time a step takes it. Only the
+        # current step's copy is visible, which also keeps savefig right.
+        for other in red_patches.values():
+            other.set_visible(False)
+        if idx not in red_patches:
+            (patch,) = nx.draw_networkx_edges(G, pos, ax=ax_graph, edgelist=[edges_list[idx]], edge_color='red',
+                                              width=2.5, arrowsize=20)
+            patch.set_animated(True)
+            red_patches[idx] = patch
+        red_patches[idx].set_visible(True)
+        return red_patches[idx]
+
+    # --- Word Rows ---
+    y_start = 0.8
+    y_step = 0.15
+    word_rows = []
+    for i in range(k):
+        y_pos = y_start - (i * y_step)
+        ax_words.text(0.05, y_pos, f"x{i+1}: ", fontsize=16, color='blue', transform=ax_words.transAxes)
+        word_rows.append(make_text_fixed_grid(ax_words, 0.15, y_pos))
+    word_artists = [text for row in word_rows for text in row['chars'] + [row['left'], row['right']]]
+
+    # --- Info ---
+    info_text = ax_info.text(0.5, 0.5, "", fontsize=14, ha='center', va='center', transform=ax_info.transAxes)
+
+    # --- Blitting ---
+    # Everything a step changes is animated: left out of full redraws and
+    # drawn over a saved background instead, the graph overlay first
+    step_artists = word_artists + [info_text]
+    for artist in [overlay_nodes] + step_artists:
+        artist.set_animated(True)
+    background = [None]
+
+    def draw_step_artists():
+        for artist in overlay_artists + step_artists:
+            fig.draw_artist(artist)
+
+    def on_draw(event):
+        # A full redraw (first show, resize, widget change) renews the background.
+        # savefig draws animated artists itself, at its own resolution.
+        if fig.canvas.is_saving():
+            return
+        background[0] = fig.canvas.copy_from_bbox(fig.bbox)
+        draw_step_artists()
+
+    fig.canvas.mpl_connect('draw_event', on_draw)
+
     def update_visualization():
-        # Clear Axes
-        ax_graph.clear()
-        ax_graph.axis('off')
-        
-        ax_words.clear()
-        ax_words.axis('off')
-        
-        ax_info.clear()
-        ax_info.axis('off')
-        
         # Get Step
         step = current_step[0]
         max_step = len(states_data) - 1
@@ -202,36 +358,27 @@ def _visualize_run_interactive(automaton: NFH, run_history: List[Tuple], initial
 
         curr_state = states_data[step]
         
-        # --- 1. Draw Graph ---
-        node_colors = []
-        for node in G.nodes():
-            if node == curr_state:
-                node_colors.append('#ff7f0e') # Matplotlib Orange
-            else:
-                node_colors.append(G.nodes[node].get('color', 'lightblue'))
-        
-        edge_colors = ['gray'] * len(G.edges())
-        edge_widths = [1] * len(G.edges())
-        
+        # --- 1. Graph Overlay ---
+        overlay = []
+        shown_nodes = [curr_state]
         # Highlight previous transition edge if possible
-        # This is tricky with multigraphs or labels, but simple check:
-        if step > 0 and (step - 1) < len(transitions_data):
-            q_prev, _, q_curr_trans = transitions_data[step-1]
-            # Try to find edge (q_prev, q_curr_trans) index
-            try:
-                edges_list = list(G.edges())
-                if (q_prev, q_curr_trans) in edges_list:
-                    idx = edges_list.index((q_prev, q_curr_trans))
-                    edge_colors[idx] = 'red'
-                    edge_widths[idx] = 2.5
-            except ValueError:
-                pass
-
-        nx.draw_networkx_nodes(G, pos, ax=ax_graph, node_color=node_colors, node_size=1500)
-        nx.draw_networkx_labels(G, pos, ax=ax_graph, font_weight='bold')
-        nx.draw_networkx_edges(G, pos, ax=ax_graph, edge_color=edge_colors, width=edge_widths, arrowsize=20)
-        nx.draw_networkx_edge_labels(G, pos, ax=ax_graph, edge_labels=base_edge_labels, font_size=8)
-        ax_graph.set_title("Automaton State", fontsize=14, loc='left')
+        edge_idx = step_edges[step] if step < len(step_edges) else None
+        if edge_idx is None:
+            for patch in red_patches.values():
+                patch.set_visible(False)
+        else:
+            edge = edges_list[edge_idx]
+            overlay.append(red_patch(edge_idx))
+            if edge in edge_texts:
+                overlay.append(edge_texts[edge])
+            if edge[0] != curr_state:
+                shown_nodes.insert(0, edge[0])
+        node_colors = [base_color[node] for node in shown_nodes[:-1]] + ['#ff7f0e'] # Matplotlib Orange
+        overlay_nodes.set_offsets([pos[node] for node in shown_nodes])
+        overlay_nodes.set_facecolor(node_colors)
+        overlay.append(overlay_nodes)
+        overlay.extend(node_texts[node] for node in shown_nodes)
+        overlay_artists[:] = overlay
 
         # --- 2. Update Info ---
         is_acc = curr_state in automaton.accepting_states
@@ -248,22 +395,19 @@ def _visualize_run_interactive(automaton: NFH, run_history: List[Tuple], initial
                 last_trans = "End"
             status_text = f"Step: {step} / {max_step}\nCurrent State: {state_display}\n{last_trans}"
         
-        ax_info.text(0.5, 0.5, status_text, fontsize=14, ha='center', va='center', transform=ax_info.transAxes)
+        info_text.set_text(status_text)
         
         # --- 3. Update Words ---
-        if step < len(cursor_history):
-            cursors = cursor_history[step]
-            y_start = 0.8
-            y_step = 0.15
-            for i, word in enumerate(initial_assignment):
-                c_idx = cursors[i]
-                y_pos = y_start - (i * y_step)
-                ax_words.text(0.05, y_pos, f"x{i+1}: ", fontsize=16, color='blue', transform=ax_words.transAxes)
-                render_text_fixed_grid(ax_words, 0.15, y_pos, word, c_idx)
+        cursors = cursor_history[step]
+        for row, word, c_idx in zip(word_rows, initial_assignment, cursors):
+            render_text_fixed_grid(row, word, c_idx)
+
+        if background[0] is None or not fig.canvas.supports_blit:
+            fig.canvas.draw_idle()
         else:
-             ax_words.text(0.5, 0.5, "Error", ha='center')
-            
-        plt.draw()
+            fig.canvas.restore_region(background[0])
+            draw_step_artists()
+            fig.canvas.blit(fig.bbox)
 
     # --- Interaction ---
 
@@ -294,7 +438,7 @@ def _visualize_run_interactive(automaton: NFH, run_history: List[Tuple], initial
             timer.add_callback(timer_callback)
             timer.start()
             anim_state['timer'] = timer
-            plt.draw()
+            fig.canvas.draw_idle()
 
     def stop_animation():
         if anim_state['running']:
@@ -303,7 +447,7 @@ def _visualize_run_interactive(automaton: NFH, run_history: List[Tuple], initial
             if anim_state['timer']:
                 anim_state['timer'].stop()
                 anim_state['timer'] = None
-            plt.draw()
+            fig.canvas.draw_idle()
 
     def toggle_animation(event):
         if anim_state['running']:
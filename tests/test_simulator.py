@@ -1,6 +1,19 @@
+import multiprocessing
 import unittest
+from itertools import product
+from unittest import mock
 from src.base import NFH, Hyperword
-from src.simulator import checkMembership
+from src.run_manager import RunManager
+from src.simulator import MINIMIZE_THRESHOLD, checkMembership, check_models, check_models_parallel
+
+
+class CountingRunManager(RunManager):
+    runs = 0
+
+    def run(self):
+        CountingRunManager.runs += 1
+        return super().run()
+
 
 class TestCheckMembership(unittest.TestCase):
     def test_exists_exists(self):
@@ -226,5 +239,68 @@ class TestCheckMembership(unittest.TestCase):
         self.assertIn(('a',), assignments)
         self.assertIn(('b',), assignments)
 
+    def test_quantifiers_short_circuit(self):
+        # q0 -a,a-> q1: only the assignment (a, a) is accepted
+        delta = {('q0', ('a', 'a'), 'q1')}
+        S = Hyperword({'a', 'b', 'c'})
+        for alpha, expected in ((['A', 'A'], False), (['E', 'E'], True)):
+            nfh = NFH({'q0', 'q1'}, {'q0'}, {'q1'}, 2, delta, alpha, {'a', 'b', 'c'})
+            CountingRunManager.runs = 0
+            with mock.patch('src.simulator.RunManager', CountingRunManager):
+                result, _ = checkMembership(nfh, S)
+            self.assertEqual(result, expected)
+            # A stops at its first failing assignment, E at its first success
+            self.assertLess(CountingRunManager.runs, len(S) ** 2)
+
+    def test_parallel_matches_sequential(self):
+        states = {'q0', 'q1'}
+        alphabet = {'a', 'b'}
+        delta = {
+            ('q0', ('a', 'a'), 'q1'),
+            ('q0', ('b', 'a'), 'q1')
+        }
+        S = Hyperword({'a', 'b'})
+        for alpha in (['A', 'E'], ['E', 'A'], ['A', 'A'], ['E', 'E']):
+            nfh = NFH(states, {'q0'}, {'q1'}, 2, delta, alpha, alphabet)
+            quantifiers = [1, 2]
+            expected, expected_managers = check_models(nfh, S, quantifiers, {})
+            result, managers = check_models_parallel(nfh, S, quantifiers, max_workers=2)
+            self.assertEqual(result, expected)
+            self.assertEqual(len(managers), len(expected_managers))
+
+    def test_no_quantifiers_large_hyperword(self):
+        # k = 0 has no outermost quantifier to split across workers
+        nfh = NFH({'q0'}, {'q0'}, {'q0'}, 0, set(), [], {'a'})
+        S = Hyperword({'a' * i for i in range(600)})
+        result, managers = checkMembership(nfh, S, max_workers=2)
+        self.assertTrue(result)
+        self.assertEqual(len(managers), 1)
+
+    def test_parallel_stops_workers_on_early_exit(self):
+        # 'c' * 12 cannot be read, so A A fails on the first chunk
+        delta = {('q0', (x, y), 'q0') for x in 'ab' for y in 'abc'}
+        delta |= {('q0', ('#', y), 'q0') for y in 'abc'} | {('q0', (x, '#'), 'q0') for x in 'ab'}
+        nfh = NFH({'q0'}, {'q0'}, {'q0'}, 2, delta, ['A', 'A'], {'a', 'b', 'c'})
+        words = {''.join(p) for n in range(1, 10) for p in product('ab', repeat=n)} | {'c' * 12}
+        result, managers = checkMembership(nfh, Hyperword(words), max_workers=2)
+        self.assertFalse(result)
+        self.assertEqual(multiprocessing.active_children(), [])
+
+    def test_parallel_is_opt_in(self):
+        nfh = NFH({'q0'}, {'q0'}, {'q0'}, 1, {('q0', ('a',), 'q0')}, ['A'], {'a'})
+        S = Hyperword({'a' * i for i in range(600)})
+        with mock.patch('src.simulator.check_models_parallel') as parallel:
+            self.assertTrue(checkMembership(nfh, S)[0])
+        parallel.assert_not_called()
+
+    def test_minimizes_only_large_hyperwords(self):
+        delta = {('q0', ('a',), 'q0'), ('q0', ('b',), 'q1')}
+        nfh = NFH({'q0', 'q1'}, {'q0'}, {'q1'}, 1, delta, ['A'], {'a', 'b'})
+        self.assertTrue(checkMembership(nfh, Hyperword({'ab', 'b'}))[0])
+        self.assertIsNone(nfh.min_dfa)
+        words = {'a' * i + 'b' for i in range(MINIMIZE_THRESHOLD)}
+        self.assertTrue(checkMembership(nfh, Hyperword(words))[0])
+        self.assertIsNotNone(nfh.min_dfa)
+
 if __name__ == '__main__':
     unittest.main()
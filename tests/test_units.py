@@ -1,8 +1,15 @@
 import unittest
 from collections import deque
-from src.base import NFH
+from src.base import NFH, Hyperword, MAX_WILDCARD_EXPANSION
 from src.run_manager import RunManager
 
+
+def chain_nfh(n, k=1):
+    # q0 -a-> q1 -a-> ... -a-> qn (acc), reading 'a' on every tape
+    delta = {(f'q{i}', ('a',) * k, f'q{i+1}') for i in range(n)}
+    states = {f'q{i}' for i in range(n + 1)}
+    return NFH(states, {'q0'}, {f'q{n}'}, k, delta, ['E'] * k, {'a'})
+
 class TestNFHValidationUnit(unittest.TestCase):
     def test_valid_init(self):
         NFH({'q0'}, {'q0'}, {'q0'}, 1, {('q0', ('a',), 'q0')}, ['E'], {'a'})
@@ -56,7 +63,49 @@ class TestNFHValidationUnit(unittest.TestCase):
         self.assertIsInstance(nfh, NFH)
 
     def test_mix_types_in_states(self):
-        pass
+        nfh = NFH({'q0', 1}, {'q0'}, {1}, 1, {('q0', ('a',), 1)}, ['E'], {'a'})
+        self.assertEqual(nfh.name_of(nfh.id_of(1)), 1)
+        self.assertTrue(RunManager(nfh, ['a']).run())
+        self.assertFalse(RunManager(nfh, ['aa']).run())
+
+    def test_skip_validate(self):
+        nfh = NFH({'q0'}, {'q0'}, {'q0'}, 1, set(), ['E', 'E'], {'a'}, _skip_validate=True)
+        with self.assertRaises(AssertionError):
+            nfh._validate()
+
+    def test_cached_structure_validates_alpha(self):
+        NFH({'q0'}, {'q0'}, {'q0'}, 1, set(), ['E'], {'a'})
+        with self.assertRaises(AssertionError):
+            NFH({'q0'}, {'q0'}, {'q0'}, 1, set(), ['Z'], {'a'})
+
+    def test_state_ids_round_trip(self):
+        nfh = NFH({'q0', 'q1', 'q2'}, {'q0'}, {'q2'}, 1, set(), ['E'], {'a'})
+        self.assertEqual(sorted(nfh.id_of(s) for s in nfh.states), [0, 1, 2])
+        for state in nfh.states:
+            self.assertEqual(nfh.name_of(nfh.id_of(state)), state)
+        self.assertEqual(nfh.accepting_ids, {nfh.id_of('q2')})
+        self.assertEqual(nfh.initial_mask, 1 << nfh.id_of('q0'))
+        self.assertEqual(nfh.accepting_mask, 1 << nfh.id_of('q2'))
+
+    def test_labels_interned(self):
+        delta = {('q0', tuple('ab'), 'q1'), ('q1', ('a', 'b'), 'q0'), ('q1', ('#', 'b'), 'q1')}
+        nfh = NFH({'q0', 'q1'}, {'q0'}, {'q1'}, 2, delta, ['E', 'E'], {'a', 'b'})
+        self.assertEqual(sorted(nfh.labels), [('#', 'b'), ('a', 'b')])
+        for label, i in nfh.label_id.items():
+            self.assertIs(nfh.labels[i], label)
+        self.assertEqual(nfh.delta_index[('q1', nfh.label_id[('a', 'b')])], ['q0'])
+
+    def test_alpha_mask(self):
+        nfh = NFH({'q0'}, {'q0'}, {'q0'}, 3, set(), ['E', 'A', 'E'], {'a'})
+        self.assertEqual(nfh.alpha_mask, 0b101)
+
+    def test_encode(self):
+        nfh = NFH({'q0'}, {'q0'}, {'q0'}, 1, set(), ['E'], {'a', 'b'})
+        self.assertEqual(nfh.encode('abxa'), bytes([1, 2, nfh.foreign_sym, 1]))
+        self.assertEqual(nfh.encode(''), b'')
+        # Characters outside Latin-1 take the per-character path
+        nfh = NFH({'q0'}, {'q0'}, {'q0'}, 1, set(), ['E'], {'a', '\u03b1'})
+        self.assertEqual(nfh.encode('\u03b1ax'), bytes([2, 1, nfh.foreign_sym]))
 
     def test_delta_not_set(self):
         delta = [('q0', ('a',), 'q0')]
@@ -64,6 +113,98 @@ class TestNFHValidationUnit(unittest.TestCase):
         self.assertEqual(len(nfh.delta), 1)
 
 
+class TestClosureAndDFAUnit(unittest.TestCase):
+    def test_epsilon_closure(self):
+        # q0 -#-> q1 -#-> q2, q2 -#-> q1, q2 -a-> q0
+        delta = {('q0', ('#',), 'q1'), ('q1', ('#',), 'q2'), ('q2', ('#',), 'q1'), ('q2', ('a',), 'q0')}
+        nfh = NFH({'q0', 'q1', 'q2'}, {'q0'}, {'q2'}, 1, delta, ['E'], {'a'})
+        q0, q1, q2 = (1 << nfh.id_of(s) for s in ('q0', 'q1', 'q2'))
+        self.assertEqual(nfh.eps_closure[nfh.id_of('q0')], q0 | q1 | q2)
+        self.assertEqual(nfh.eps_closure[nfh.id_of('q1')], q1 | q2)
+        self.assertEqual(nfh.eps_closure[nfh.id_of('q2')], q1 | q2)
+        a = nfh.sym_idx['a']
+        self.assertEqual(nfh.trans_flat[nfh.id_of('q2') * nfh.num_syms + a], q0)
+        self.assertEqual(nfh.trans_closed[nfh.id_of('q2') * nfh.num_syms + a], q0 | q1 | q2)
+
+    def test_determinize(self):
+        delta = {('q0', ('a',), 'q1'), ('q0', ('a',), 'q2'), ('q1', ('b',), 'q3'), ('q2', ('a',), 'q3')}
+        nfh = NFH({'q0', 'q1', 'q2', 'q3'}, {'q0'}, {'q3'}, 1, delta, ['E'], {'a', 'b'})
+        q0, q1, q2, q3 = (1 << nfh.id_of(s) for s in ('q0', 'q1', 'q2', 'q3'))
+        a, b = nfh.sym_idx['a'], nfh.sym_idx['b']
+        dfa = nfh.determinize()
+        self.assertEqual(dfa[q0 << 8 | a], q1 | q2)
+        self.assertEqual(dfa[q0 << 8 | b], 0)
+        self.assertEqual(dfa[(q1 | q2) << 8 | a], q3)
+        self.assertEqual(dfa[(q1 | q2) << 8 | b], q3)
+        self.assertEqual(nfh.dfa_step(q1 | q2, b), q3)
+
+    def test_minimize_merges_equivalent_subsets(self):
+        # ab|cb: the states after 'a' and after 'c' are equivalent, as are the ends
+        delta = {('q0', ('a',), 'q1'), ('q1', ('b',), 'q3'), ('q0', ('c',), 'q2'), ('q2', ('b',), 'q4')}
+        nfh = NFH({'q0', 'q1', 'q2', 'q3', 'q4'}, {'q0'}, {'q3', 'q4'}, 1, delta, ['E'], {'a', 'b', 'c'})
+        blocks, table, accepting_blocks = nfh.minimize()
+        q1, q2, q3, q4 = (1 << nfh.id_of(s) for s in ('q1', 'q2', 'q3', 'q4'))
+        self.assertEqual(blocks[q1], blocks[q2])
+        self.assertEqual(blocks[q3], blocks[q4])
+        # q0, the merged middle, the merged end and the dead state
+        self.assertEqual(len(set(blocks.values())), 4)
+        self.assertEqual(accepting_blocks, 1 << blocks[q3])
+        self.assertEqual(table[blocks[q1] * nfh.num_syms + nfh.sym_idx['b']], blocks[q3])
+        self.assertTrue(RunManager(nfh, ['cb']).run())
+        self.assertFalse(RunManager(nfh, ['ca']).run())
+
+    def test_min_dfa_run_from_other_state(self):
+        # The minimized DFA only knows the subsets reachable from q0
+        delta = {('q0', ('a',), 'q1'), ('q0', ('a',), 'q2'), ('q1', ('b',), 'q3'), ('q2', ('c',), 'q3')}
+        states = {'q0', 'q1', 'q2', 'q3'}
+        nfh = NFH(states, {'q0'}, {'q3'}, 1, delta, ['E'], {'a', 'b', 'c'})
+        nfh.minimize()
+        self.assertTrue(RunManager(nfh, ['b'], initial_state='q1').run())
+        self.assertFalse(RunManager(nfh, ['c'], initial_state='q1').run())
+        # A structurally equal NFH shares the minimized DFA
+        other = NFH(states, {'q0'}, {'q3'}, 1, set(delta), ['E'], {'a', 'b', 'c'})
+        self.assertTrue(RunManager(other, ['b'], initial_state='q1').run())
+
+    def test_minimize_too_large_is_cached(self):
+        # The 13th symbol from the end is 'a': 2 ** 13 reachable subsets
+        n = 13
+        delta = {('q0', ('a',), 'q0'), ('q0', ('b',), 'q0'), ('q0', ('a',), 'p1')}
+        delta |= {(f'p{i}', (s,), f'p{i+1}') for i in range(1, n) for s in 'ab'}
+        states = {'q0'} | {f'p{i}' for i in range(1, n + 1)}
+        nfh = NFH(states, {'q0'}, {f'p{n}'}, 1, delta, ['E'], {'a', 'b'})
+        self.assertIsNone(nfh.minimize())
+        self.assertIs(nfh.min_dfa, False)
+        self.assertIsNone(nfh.minimize())
+        self.assertTrue(RunManager(nfh, ['b' + 'a' * n]).run())
+
+    def test_minimized_merges_bisimilar_states(self):
+        # q1 and q2 both read (b, #) into an accepting sink
+        delta = {('q0', ('a', 'a'), 'q1'), ('q0', ('a', 'b'), 'q2'), ('q1', ('b', '#'), 'q3'),
+                 ('q2', ('b', '#'), 'q4')}
+        nfh = NFH({'q0', 'q1', 'q2', 'q3', 'q4'}, {'q0'}, {'q3', 'q4'}, 2, delta, ['E', 'A'], {'a', 'b'})
+        reduced = nfh.minimized()
+        self.assertEqual(reduced.states, {'q0', 'q1', 'q3'})
+        self.assertEqual(nfh.quotient[1]['q2'], 'q1')
+        self.assertEqual(reduced.alpha, ['E', 'A'])
+        self.assertIs(nfh.minimized(), reduced)
+        self.assertIs(reduced.minimized(), reduced)
+        rm = RunManager(nfh, ['ab', 'b'], minimize=True)
+        self.assertIs(rm.nfh, reduced)
+        self.assertTrue(rm.run())
+        self.assertEqual([t[2] for t in rm.run_history], ['q1', 'q3'])
+        self.assertFalse(RunManager(nfh, ['ab', 'bb'], minimize=True).run())
+
+    def test_epsilon_closure_acyclic(self):
+        # q0 -#-> q1 -#-> q3, q0 -#-> q2 -#-> q3, q3 -#,a-> q0 consumes
+        delta = {('q0', ('#', '#'), 'q1'), ('q1', ('#', '#'), 'q3'), ('q0', ('#', '#'), 'q2'),
+                 ('q2', ('#', '#'), 'q3'), ('q3', ('#', 'a'), 'q0')}
+        nfh = NFH({'q0', 'q1', 'q2', 'q3'}, {'q0'}, {'q3'}, 2, delta, ['E', 'E'], {'a'})
+        q0, q1, q2, q3 = (1 << nfh.id_of(s) for s in ('q0', 'q1', 'q2', 'q3'))
+        self.assertEqual(nfh.eps_closure[nfh.id_of('q0')], q0 | q1 | q2 | q3)
+        self.assertEqual(nfh.eps_closure[nfh.id_of('q2')], q2 | q3)
+        self.assertEqual(nfh.eps_closure[nfh.id_of('q3')], q3)
+
+
 class TestRunManagerInitUnit(unittest.TestCase):
     def setUp(self):
         self.nfh = NFH({'q0'}, {'q0'}, {'q0'}, 2, set(), ['E', 'E'], {'a', 'b'})
@@ -73,6 +214,20 @@ class TestRunManagerInitUnit(unittest.TestCase):
         # New RunManager stores assignment as tuple of strings/deques, we just check generic init success
         self.assertIsNotNone(rm.assignment)
 
+    def test_init_assignment_dict(self):
+        rm = RunManager(self.nfh, {'2': deque('ba'), '1': 'ab'})
+        self.assertEqual(rm.assignment, ('ab', 'ba'))
+        self.assertEqual(rm.tapes, (self.nfh.encode('ab'), self.nfh.encode('ba')))
+
+    def test_variables_follow_cursors(self):
+        nfh = NFH({'q0', 'q1'}, {'q0'}, {'q1'}, 2, {('q0', ('a', 'b'), 'q1')}, ['E', 'E'], {'a', 'b'})
+        rm = RunManager(nfh, ['a', 'b'])
+        self.assertEqual(rm.variables, {'1': deque('a'), '2': deque('b')})
+        self.assertTrue(rm.run())
+        self.assertEqual(rm.variables, {'1': deque(), '2': deque()})
+        # A second run starts over from the beginning of the tapes
+        self.assertTrue(rm.run())
+
     def test_init_assignment_len_short(self):
         with self.assertRaises(AssertionError):
             RunManager(self.nfh, ['a'])
@@ -109,9 +264,18 @@ class TestRunManagerInitUnit(unittest.TestCase):
 
 
 class TestExecutionUnit(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # NFHs shared by several tests; runs never modify them
+        cls.single_a = NFH({'q0', 'q1'}, {'q0'}, {'q1'}, 1, {('q0', ('a',), 'q1')}, ['E'], {'a'})
+        # q0 -a-> q0 -b-> q1
+        delta = {('q0', ('a',), 'q0'), ('q0', ('b',), 'q1')}
+        cls.a_loop_then_b = NFH({'q0', 'q1'}, {'q0'}, {'q1'}, 1, delta, ['E'], {'a', 'b'})
+        delta = {('q0', ('a', 'b', 'c'), 'q1')}
+        cls.k3_sync = NFH({'q0', 'q1'}, {'q0'}, {'q1'}, 3, delta, ['E']*3, {'a', 'b', 'c'})
+
     def test_simple_path_k1(self):
-        nfh = NFH({'q0', 'q1'}, {'q0'}, {'q1'}, 1, {('q0', ('a',), 'q1')}, ['E'], {'a'})
-        rm = RunManager(nfh, ['a'])
+        rm = RunManager(self.single_a, ['a'])
         self.assertTrue(rm.run())
 
     def test_simple_path_k1_fail(self):
@@ -130,10 +294,7 @@ class TestExecutionUnit(unittest.TestCase):
         self.assertFalse(rm.run())
 
     def test_cycle_success(self):
-        # q0 -a-> q0 -b-> q1
-        delta = {('q0', ('a',), 'q0'), ('q0', ('b',), 'q1')}
-        nfh = NFH({'q0', 'q1'}, {'q0'}, {'q1'}, 1, delta, ['E'], {'a', 'b'})
-        rm = RunManager(nfh, ['aaab'])
+        rm = RunManager(self.a_loop_then_b, ['aaab'])
         self.assertTrue(rm.run())
 
     def test_cycle_fail(self):
@@ -157,29 +318,21 @@ class TestExecutionUnit(unittest.TestCase):
         self.assertFalse(rm.run())
 
     def test_k3_sync_success(self):
-        delta = {('q0', ('a', 'b', 'c'), 'q1')}
-        nfh = NFH({'q0', 'q1'}, {'q0'}, {'q1'}, 3, delta, ['E']*3, {'a', 'b', 'c'})
-        rm = RunManager(nfh, ['a', 'b', 'c'])
+        rm = RunManager(self.k3_sync, ['a', 'b', 'c'])
         self.assertTrue(rm.run())
 
     def test_k3_partial_fail(self):
-        delta = {('q0', ('a', 'b', 'c'), 'q1')}
-        nfh = NFH({'q0', 'q1'}, {'q0'}, {'q1'}, 3, delta, ['E']*3, {'a', 'b', 'c'})
-        rm = RunManager(nfh, ['a', 'b', 'x'])
+        rm = RunManager(self.k3_sync, ['a', 'b', 'x'])
         self.assertFalse(rm.run())
 
     def test_deep_path(self):
         # Chain 20 states
         N = 20
-        delta = {(f'q{i}', ('a',), f'q{i+1}') for i in range(N)}
-        states = {f'q{i}' for i in range(N+1)}
-        nfh = NFH(states, {'q0'}, {f'q{N}'}, 1, delta, ['E'], {'a'})
-        rm = RunManager(nfh, ['a'*N])
+        rm = RunManager(chain_nfh(N), ['a'*N])
         self.assertTrue(rm.run())
 
     def test_leftover_buffer_rejects(self):
-        nfh = NFH({'q0', 'q1'}, {'q0'}, {'q1'}, 1, {('q0', ('a',), 'q1')}, ['E'], {'a'})
-        rm = RunManager(nfh, ['aa'])
+        rm = RunManager(self.single_a, ['aa'])
         self.assertFalse(rm.run())
 
     def test_buffer_consumption_check(self):
@@ -215,6 +368,14 @@ class TestExecutionUnit(unittest.TestCase):
         rm = RunManager(nfh, ['a'])
         self.assertTrue(rm.run())
 
+    def test_epsilon_history(self):
+        # q0 -a-> q1 -#-> q2 -#-> q3 (acc), q1 -#-> q3 shortcut
+        delta = {('q0', ('a',), 'q1'), ('q1', ('#',), 'q2'), ('q2', ('#',), 'q3'), ('q1', ('#',), 'q3')}
+        nfh = NFH({'q0', 'q1', 'q2', 'q3'}, {'q0'}, {'q3'}, 1, delta, ['E'], {'a'})
+        rm = RunManager(nfh, ['a'])
+        self.assertTrue(rm.run())
+        self.assertEqual(rm.run_history, [('q0', ('a',), 'q1'), ('q1', ('#',), 'q3')])
+
     def test_backtracking_correctness(self):
         # q0 -a-> q1 (dead)
         # q0 -a-> q2 -b-> q3 (acc)
@@ -228,11 +389,78 @@ class TestExecutionUnit(unittest.TestCase):
     def test_stack_depth_limit_implicit(self):
         # Standard python recursion limit is 1000. 200 should be fine.
         N = 200
-        delta = {(f'q{i}', ('a',), f'q{i+1}') for i in range(N)}
-        states = {f'q{i}' for i in range(N+1)}
-        nfh = NFH(states, {'q0'}, {f'q{N}'}, 1, delta, ['E'], {'a'})
-        rm = RunManager(nfh, ['a'*N])
+        rm = RunManager(chain_nfh(N), ['a'*N])
+        self.assertTrue(rm.run())
+
+    def test_deep_path_beyond_recursion_limit(self):
+        # The search is iterative, so runs longer than sys.getrecursionlimit() work
+        N = 3000
+        rm = RunManager(chain_nfh(N, k=2), ['a'*N, 'a'*N], enable_timeout=False)
+        self.assertTrue(rm.run())
+        self.assertEqual(len(rm.run_history), N)
+
+    def test_history_references_delta(self):
+        delta = [('q0', ('a', '#'), 'q1'), ('q1', ('#', 'b'), 'q2')]
+        nfh = NFH({'q0', 'q1', 'q2'}, {'q0'}, {'q2'}, 2, delta, ['E', 'E'], {'a', 'b'})
+        rm = RunManager(nfh, ['a', 'b'])
         self.assertTrue(rm.run())
+        self.assertEqual(len(rm.run_history), 2)
+        for step, transition in zip(rm.run_history, delta):
+            self.assertIs(step, transition)
+
+    def test_equal_structures_share_index(self):
+        delta = {('q0', ('a',), 'q1'), ('q1', ('b',), 'q0')}
+        first = NFH({'q0', 'q1'}, {'q0'}, {'q1'}, 1, delta, ['E'], {'a', 'b'})
+        second = NFH({'q0', 'q1'}, {'q0'}, {'q1'}, 1, set(delta), ['A'], {'a', 'b'})
+        self.assertIs(first.trans_by_bytes, second.trans_by_bytes)
+        self.assertEqual(second.alpha_mask, 0)
+        other = NFH({'q0', 'q1'}, {'q0'}, {'q0'}, 1, delta, ['E'], {'a', 'b'})
+        self.assertIsNot(first.trans_by_bytes, other.trans_by_bytes)
+
+    def test_wildcard_mask_labels(self):
+        # Seven '#' over three head codes expand past MAX_WILDCARD_EXPANSION
+        k = 8
+        delta = {('q0', ('a',) + ('#',) * 7, 'q1'), ('q1', ('#',) * 7 + ('a',), 'q2')}
+        nfh = NFH({'q0', 'q1', 'q2'}, {'q0'}, {'q2'}, k, delta, ['E'] * k, {'a'})
+        entries, masks = nfh.wildcard_masks[nfh.id_of('q0')]
+        self.assertEqual(len(entries), 1)
+        self.assertEqual(masks[0][nfh.sym_idx['a']], 1)
+        self.assertEqual(masks[0][0], 0)
+        rm = RunManager(nfh, ['a'] + [''] * 6 + ['a'])
+        self.assertTrue(rm.run())
+        self.assertEqual([t[2] for t in rm.run_history], ['q1', 'q2'])
+        rm = RunManager(nfh, ['a'] * k)
+        self.assertFalse(rm.run())
+
+    def test_wide_alphabet_wildcards_stay_small(self):
+        # Two '#' over 26 letters would expand to 28 ** 2 keys per label
+        alphabet = {chr(ord('a') + i) for i in range(26)}
+        n = 50
+        delta = set()
+        for i in range(n):
+            for j, letter in enumerate('abcde'):
+                label = ['#'] * 3
+                label[j % 3] = letter
+                delta.add((f'q{i}', tuple(label), f'q{(i + j + 1) % n}'))
+        nfh = NFH({f'q{i}' for i in range(n)}, {'q0'}, {'q1'}, 3, delta, ['E'] * 3, alphabet)
+        self.assertLessEqual(sum(map(len, nfh.trans_by_bytes)), MAX_WILDCARD_EXPANSION * len(delta))
+        self.assertIsNotNone(nfh.wildcard_masks[nfh.id_of('q0')])
+        # q0 -(a,#,#)-> q1
+        self.assertTrue(RunManager(nfh, ['a', '', '']).run())
+        self.assertFalse(RunManager(nfh, ['', 'a', '']).run())
+
+    def test_large_alphabet(self):
+        # 300 symbols do not fit in single-byte codes, so tapes are tuples
+        alphabet = {chr(0x100 + i) for i in range(300)}
+        x, y = chr(0x100), chr(0x100 + 299)
+        delta = {('q0', (x, '#'), 'q1'), ('q1', ('#', y), 'q2')}
+        nfh = NFH({'q0', 'q1', 'q2'}, {'q0'}, {'q2'}, 2, delta, ['E', 'E'], alphabet)
+        self.assertEqual(nfh.encode(x + 'a'), (nfh.sym_idx[x], nfh.foreign_sym))
+        self.assertTrue(RunManager(nfh, [x, y]).run())
+        self.assertFalse(RunManager(nfh, [y, x]).run())
+        single = NFH({'q0', 'q1'}, {'q0'}, {'q1'}, 1, {('q0', (y,), 'q1')}, ['E'], alphabet)
+        self.assertTrue(RunManager(single, [y]).run())
+        self.assertFalse(RunManager(single, [x]).run())
 
     def test_complex_branching_tree(self):
         # q0 -> q1, q2
@@ -251,10 +479,7 @@ class TestExecutionUnit(unittest.TestCase):
              self.assertEqual(rm.run_history[-1][2], 'q6')
 
     def test_cycle_with_exit(self):
-        # q0 -a-> q0, q0 -b-> q1 (acc)
-        delta = {('q0', ('a',), 'q0'), ('q0', ('b',), 'q1')}
-        nfh = NFH({'q0', 'q1'}, {'q0'}, {'q1'}, 1, delta, ['E'], {'a', 'b'})
-        rm = RunManager(nfh, ['aaaab'])
+        rm = RunManager(self.a_loop_then_b, ['aaaab'])
         self.assertTrue(rm.run())
 
 
@@ -271,12 +496,8 @@ class TestTimeoutUnit(unittest.TestCase):
         # Very short timeout param but disabled -> should run longer if needed
         # We need a long enough run that would fail if timeout was 1e-8
         N = 500
-        delta = {(f'q{i}', ('a',), f'q{i+1}') for i in range(N)}
-        states = {f'q{i}' for i in range(N+1)}
-        nfh = NFH(states, {'q0'}, {f'q{N}'}, 1, delta, ['E'], {'a'})
-        
         # Actually checking time is flaky. Just ensure it succeeds.
-        rm = RunManager(nfh, ['a'*N], timeout=0.00000001, enable_timeout=False)
+        rm = RunManager(chain_nfh(N), ['a'*N], timeout=0.00000001, enable_timeout=False)
         self.assertTrue(rm.run())
 
     def test_negative_timeout_immediate_stop(self):
@@ -286,6 +507,13 @@ class TestTimeoutUnit(unittest.TestCase):
         rm = RunManager(nfh, ['a'], timeout=-1.0)
         self.assertFalse(rm.run())
 
+    def test_zero_timeout_immediate_stop(self):
+        delta = {('q0', ('a', 'a'), 'q1')}
+        nfh = NFH({'q0', 'q1'}, {'q0'}, {'q1'}, 2, delta, ['E', 'E'], {'a'})
+        rm = RunManager(nfh, ['a', 'a'], timeout=0)
+        self.assertFalse(rm.run())
+        self.assertEqual(rm.run_history, [])
+
 
 class TestAcceptanceUnit(unittest.TestCase):
     def test_accepts_empty(self):
@@ -317,5 +545,14 @@ class TestAcceptanceUnit(unittest.TestCase):
         rm = RunManager(NFH({'q0'}, {'q0'}, {'q0'}, 2, set(), ['E']*2, {}), ['', 'b'])
         self.assertFalse(rm.run())
 
+class TestHyperwordUnit(unittest.TestCase):
+    def test_sorted_long_first(self):
+        S = Hyperword({'b', 'aa', '', 'a', 'ab'})
+        self.assertEqual(S.sorted_long_first, ['aa', 'ab', 'a', 'b', ''])
+
+    def test_sorted_long_first_cached(self):
+        S = Hyperword({'a', 'b'})
+        self.assertIs(S.sorted_long_first, S.sorted_long_first)
+
 if __name__ == '__main__':
     unittest.main()